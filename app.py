@@ -1,15 +1,26 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import (
+    AutoTokenizer, AutoModelForSeq2SeqLM, BatchEncoding, TextIteratorStreamer,
+    StoppingCriteria, StoppingCriteriaList
+)
+from transformers.modeling_outputs import BaseModelOutput
 import logging
 import time
 import os
-from typing import Optional, List
+import shutil
+import tempfile
+import asyncio
+import anyio
+import threading
+import zlib
+from typing import Optional, List, Union
+from cachetools import LRUCache
 import uvicorn
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 
 # Configure logging
 logging.basicConfig(
@@ -22,11 +33,193 @@ logger = logging.getLogger(__name__)
 model = None
 tokenizer = None
 device = None
+model_name = None
+model_dtype = torch.float32
+# "pytorch" or "onnxruntime", depending on how the model was loaded
+backend = None
+# Token ids of the fixed "paraphrase:" prompt prefix, tokenized once at load time
+prefix_ids = None
+# Model details shared by every response, built once the model is loaded
+base_model_details = {}
+
+# Micro-batching configuration: concurrent /paraphrase calls are coalesced
+# into a single padded generate call of up to MAX_BATCH texts
+MAX_BATCH = int(os.getenv("MAX_BATCH", 16))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", 10))
+
+# Longest tokenized input (prefix + text + </s>) passed to the encoder
+MAX_INPUT_LENGTH = 512
+
+# Pinned host buffers and copy stream used to stage inputs for CUDA
+pinned_input_ids = None
+pinned_attention_mask = None
+h2d_stream = None
+staging_lock = threading.Lock()
+
+# LRU cache of generated paraphrases keyed on the text and generation parameters
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", 4096))
+paraphrase_cache = LRUCache(maxsize=max(CACHE_SIZE, 1))
+cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+# Queue of (request, future) tuples consumed by the batch worker
+request_queue = None
+batch_worker_task = None
+
+# Uvicorn worker processes: several on CPU (each loads its own quantized
+# model), one on GPU so concurrent graphs don't run out of memory
+WORKERS = int(os.getenv("WORKERS", 0)) or (1 if torch.cuda.is_available() else 2)
+
+# Only one generate call runs at a time per process; it runs in a thread so
+# the event loop keeps serving health checks and CORS preflights meanwhile
+inference_semaphore = asyncio.Semaphore(1)
+
+# Decode with a traced encoder and traced decoder/past_key_values modules
+# instead of model.generate (stored on app.state at startup)
+USE_TRACED_DECODER = os.getenv("USE_TRACED_DECODER", "false").lower() == "true"
+
+# Compile the model forward with torch.compile (mode="reduce-overhead")
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() == "true"
+
+# Serve the model through ONNX Runtime (requires optimum[onnxruntime]); the
+# exported graph is cached in ONNX_MODEL_DIR so the export only runs once
+USE_ONNX = os.getenv("USE_ONNX", "false").lower() == "true"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx-models")
+
+def cpu_threads() -> int:
+    """Intra-op threads per worker process"""
+    # Default to one thread per physical core (assuming 2-way SMT), split
+    # across the uvicorn workers, so the workers do not oversubscribe the CPU
+    return int(os.getenv("OMP_NUM_THREADS", 0)) or max(1, (os.cpu_count() or 2) // 2 // WORKERS)
+
+def configure_cpu_backend():
+    """Pin torch thread pools and enable oneDNN fusions for CPU inference"""
+    num_threads = cpu_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once, before any inter-op parallel work has started
+        pass
+    
+    torch.backends.mkldnn.enabled = True
+    torch.jit.enable_onednn_fusion(True)
+    logger.info(f"Using {num_threads} CPU threads")
+
+def allocate_staging_buffers():
+    """Allocate pinned host buffers and a dedicated stream for host-to-device copies"""
+    global pinned_input_ids, pinned_attention_mask, h2d_stream
+    
+    # Flat buffers so any (batch, length) view of them stays contiguous
+    size = MAX_BATCH * MAX_INPUT_LENGTH
+    pinned_input_ids = torch.empty(size, dtype=torch.long, pin_memory=True)
+    pinned_attention_mask = torch.empty(size, dtype=torch.long, pin_memory=True)
+    h2d_stream = torch.cuda.Stream()
+
+def optimize_model(model):
+    """Move the model to the inference device and apply device-specific optimizations"""
+    global model_dtype
+    
+    model.to(device)
+    model.eval()
+    
+    # On CUDA, halve the weight bytes read per decode step. BF16 is preferred
+    # where supported since T5 activations can overflow in FP16
+    if device.type == "cuda":
+        model_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        model = model.to(model_dtype)
+        logger.info(f"Running model in {model_dtype}")
+    
+    # On CPU, swap nn.Linear for INT8 dynamically quantized FBGEMM kernels.
+    # Quantize in place so each worker never holds an FP32 copy next to the model
+    if device.type == "cpu" and "fbgemm" in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = "fbgemm"
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        logger.info("Applied INT8 dynamic quantization to Linear layers")
+    
+    # generate() calls model.forward on the original module, so compile the
+    # forward itself rather than wrapping the module
+    if TORCH_COMPILE:
+        model.forward = torch.compile(model.forward, mode="reduce-overhead", fullgraph=False)
+        logger.info("Compiled model forward with torch.compile")
+    
+    return model
+
+def load_tokenizer(model_name: str):
+    """Load the fast (Rust) tokenizer and precompute the prompt prefix ids"""
+    global prefix_ids
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    prefix_ids = tokenizer("paraphrase:", add_special_tokens=False).input_ids
+    return tokenizer
+
+def load_onnx_model(model_name: str):
+    """Load the model as ONNX Runtime sessions, exporting it to ONNX on first use"""
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    
+    provider = "CUDAExecutionProvider" if device.type == "cuda" else "CPUExecutionProvider"
+    export_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "--"))
+    
+    # ORT sizes its intra-op pool to every core by default, so give it the
+    # same per-worker thread count as torch
+    session_options = onnxruntime.SessionOptions()
+    if device.type == "cpu":
+        session_options.intra_op_num_threads = cpu_threads()
+        session_options.inter_op_num_threads = 1
+    
+    export_files = ("encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx")
+    def is_exported(path: str) -> bool:
+        return all(os.path.isfile(os.path.join(path, name)) for name in export_files)
+    
+    if not is_exported(export_dir):
+        # Export into a private directory and move it into place in one step, so
+        # concurrent workers never load (or cache) a partially written export
+        logger.info("Exporting model to ONNX...")
+        os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=ONNX_MODEL_DIR)
+        try:
+            ort_model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, provider=provider)
+            ort_model.save_pretrained(tmp_dir)
+            del ort_model
+            # Drop an incomplete export left behind by a crash
+            if os.path.isdir(export_dir) and not is_exported(export_dir):
+                shutil.rmtree(export_dir, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, export_dir)
+            except OSError:
+                # Another worker finished its export first
+                logger.info("Using ONNX export written by another worker")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    logger.info(f"Loading ONNX export from {export_dir}")
+    return ORTModelForSeq2SeqLM.from_pretrained(export_dir, provider=provider, session_options=session_options)
+
+def load_seq2seq_model(model_name: str):
+    """Load the model with the configured backend"""
+    global backend
+    
+    if USE_ONNX:
+        try:
+            model = load_onnx_model(model_name)
+            backend = "onnxruntime"
+            return model
+        except ImportError:
+            logger.warning("optimum[onnxruntime] is not installed, falling back to PyTorch")
+    
+    # Load weights straight into the model instead of a randomly initialized copy,
+    # since every worker loads the model at the same time
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name, low_cpu_mem_usage=True)
+    backend = "pytorch"
+    
+    # Move model to device and optimize it for inference
+    return optimize_model(model)
 
 # Model loading function
 def load_model():
     """Load IndoT5 model and tokenizer"""
-    global model, tokenizer, device
+    global model, tokenizer, device, model_name, base_model_details
     
     try:
         logger.info("Loading IndoT5 model...")
@@ -34,19 +227,20 @@ def load_model():
         # Check if CUDA is available
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {device}")
+        if device.type == "cpu":
+            configure_cpu_backend()
+        else:
+            allocate_staging_buffers()
         
         # Load tokenizer and model - using Wikidepia model
         model_name = "Wikidepia/IndoT5-base-paraphrase"
         logger.info(f"Loading model: {model_name}")
         
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        tokenizer = load_tokenizer(model_name)
+        model = load_seq2seq_model(model_name)
+        base_model_details = {"model": model_name, "device": str(device)}
         
-        # Move model to device
-        model.to(device)
-        model.eval()
-        
-        logger.info("IndoT5 model loaded successfully!")
+        logger.info(f"IndoT5 model loaded successfully with {backend}!")
         return True
         
     except Exception as e:
@@ -55,27 +249,133 @@ def load_model():
         try:
             logger.info("Trying alternative model...")
             model_name = "indonesian-nlp/indot5-base"
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-            model.to(device)
-            model.eval()
-            logger.info("Alternative model loaded successfully!")
+            tokenizer = load_tokenizer(model_name)
+            model = load_seq2seq_model(model_name)
+            base_model_details = {"model": model_name, "device": str(device)}
+            logger.info(f"Alternative model loaded successfully with {backend}!")
             return True
         except Exception as e2:
             logger.error(f"Failed to load alternative model: {str(e2)}")
             return False
 
+class EncoderWrapper(torch.nn.Module):
+    """T5 encoder returning only the last hidden state, for torch.jit.trace"""
+    
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.get_encoder()
+    
+    def forward(self, input_ids, attention_mask):
+        return self.encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+class DecoderWrapper(torch.nn.Module):
+    """T5 decoder and LM head returning (logits, past_key_values), for torch.jit.trace"""
+    
+    def __init__(self, model):
+        super().__init__()
+        self.decoder = model.get_decoder()
+        self.lm_head = model.lm_head
+        # T5 rescales the decoder output when the LM head is tied to the embeddings
+        self.scale = model.model_dim ** -0.5 if model.config.tie_word_embeddings else 1.0
+    
+    def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask, past_key_values=None):
+        outputs = self.decoder(
+            input_ids=decoder_input_ids,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            past_key_values=past_key_values,
+            use_cache=True,
+            return_dict=False
+        )
+        logits = self.lm_head(outputs[0] * self.scale)
+        return logits, outputs[1]
+
+def trace_encoder(input_ids: torch.Tensor, attention_mask: torch.Tensor):
+    """Trace the encoder; on CPU also freeze it so oneDNN can fuse its ops"""
+    encoder = torch.jit.trace(EncoderWrapper(model), (input_ids, attention_mask))
+    if device.type == "cpu":
+        encoder = torch.jit.freeze(encoder.eval())
+    return encoder
+
+def trace_model():
+    """Trace the encoder and, with USE_TRACED_DECODER, the two decoder variants used by traced_generate"""
+    logger.info("Tracing model modules...")
+    
+    example = encode_inputs(["warmup"])
+    input_ids = example["input_ids"].to(device)
+    attention_mask = example["attention_mask"].to(device)
+    
+    with torch.no_grad():
+        encoder = trace_encoder(input_ids, attention_mask)
+        app.state.traced_encoder = encoder
+        if not USE_TRACED_DECODER:
+            logger.info("Traced encoder ready!")
+            return
+        
+        encoder_hidden_states = encoder(input_ids, attention_mask)
+        decoder_input_ids = torch.full(
+            (1, 1), model.config.decoder_start_token_id, dtype=torch.long, device=device
+        )
+        
+        # First step runs without past_key_values, every later step feeds them back in
+        decoder_wrapper = DecoderWrapper(model)
+        decoder = torch.jit.trace(
+            decoder_wrapper,
+            (decoder_input_ids, encoder_hidden_states, attention_mask),
+            strict=False
+        )
+        _, past_key_values = decoder(decoder_input_ids, encoder_hidden_states, attention_mask)
+        decoder_pkv = torch.jit.trace(
+            decoder_wrapper,
+            (decoder_input_ids, encoder_hidden_states, attention_mask, past_key_values),
+            strict=False
+        )
+    
+    app.state.traced_decoder = decoder
+    app.state.traced_decoder_pkv = decoder_pkv
+    logger.info("Traced modules ready!")
+
+def warmup_model():
+    """Run representative generate calls so kernels, allocator and compile caches are warm before the first request"""
+    logger.info("Warming up model...")
+    # The first call populates the caches, the second runs on the warm path
+    for _ in range(2):
+        run_generate(
+            ["Anak anak melakukan piket kelas agar kebersihan kelas terjaga"],
+            max_length=32
+        )
+    logger.info("Model warmed up!")
+
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global request_queue, batch_worker_task
+    
     # Startup
     logger.info("Starting IndoT5 Paraphraser API...")
+    app.startup_time = time.time()
     
     # Load model
     success = load_model()
     if not success:
         logger.error("Failed to load model during startup")
         # Don't exit, let the health check handle it
+    elif backend == "pytorch" and (USE_TRACED_DECODER or device.type == "cpu"):
+        # ONNX Runtime already runs fused encoder/decoder graphs
+        try:
+            trace_model()
+        except Exception as e:
+            logger.error(f"Failed to trace model, falling back to eager modules: {str(e)}")
+    
+    if success:
+        try:
+            warmup_model()
+        except Exception as e:
+            logger.error(f"Model warmup failed: {str(e)}")
+    
+    # Start the micro-batching worker
+    request_queue = asyncio.Queue()
+    batch_worker_task = asyncio.create_task(batch_worker())
     
     logger.info("IndoT5 Paraphraser API started successfully!")
     
@@ -83,6 +383,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down IndoT5 Paraphraser API...")
+    batch_worker_task.cancel()
 
 # Initialize FastAPI app with lifespan
 app = FastAPI(
@@ -105,12 +406,14 @@ app.add_middleware(
 
 class ParaphraseRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=1000, description="Text to paraphrase")
-    style: str = Field(default="default", description="Paraphrasing style: default (model doesn't support style variations)")
+    style: str = Field(default="default", description="Paraphrasing style: accepted for API compatibility and ignored (model doesn't support style variations)")
     max_length: int = Field(default=512, ge=10, le=512, description="Maximum output length")
-    num_return_sequences: int = Field(default=1, ge=1, le=5, description="Number of paraphrase variations to generate")
+    num_return_sequences: int = Field(default=1, ge=1, le=5, description="Number of paraphrase variations to generate (returned as a list when > 1)")
+    top_k: int = Field(default=50, ge=1, le=200, description="Top-k sampling cutoff (ignored when num_return_sequences > 1)")
+    top_p: float = Field(default=0.95, gt=0.0, le=1.0, description="Nucleus sampling probability (ignored when num_return_sequences > 1)")
 
 class ParaphraseResponse(BaseModel):
-    result: str
+    result: Union[str, List[str]]
     original_text: str
     style: str
     processing_time: float
@@ -119,45 +422,358 @@ class ParaphraseResponse(BaseModel):
 class HealthResponse(BaseModel):
     status: str
     is_model_loaded: bool
+    model: Optional[str]
+    backend: Optional[str]
     device: str
     uptime: float
+    cache: dict
 
-def generate_paraphrase(text: str, style: str = "default", max_length: int = 512, num_return_sequences: int = 1) -> str:
-    """Generate paraphrase using Wikidepia/IndoT5-base-paraphrase model"""
-    try:
-        # Prepare input text according to model documentation
-        # The model expects: "paraphrase: " + sentence + " </s>"
-        input_text = "paraphrase: " + text + " </s>"
+def encode_inputs(texts: List[str]) -> BatchEncoding:
+    """Tokenize texts behind the cached prompt prefix, right-padded to the longest"""
+    # The model expects: "paraphrase: " + sentence + " </s>"
+    # Only the user text is tokenized, the prefix and </s> ids are spliced in
+    text_ids = tokenizer(
+        texts,
+        add_special_tokens=False,
+        truncation=True,
+        max_length=MAX_INPUT_LENGTH - len(prefix_ids) - 1
+    )["input_ids"]
+    sequences = [prefix_ids + ids + [tokenizer.eos_token_id] for ids in text_ids]
+    
+    longest = max(len(ids) for ids in sequences)
+    input_ids = torch.full((len(sequences), longest), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), longest), dtype=torch.long)
+    for row, ids in enumerate(sequences):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+    
+    return BatchEncoding({"input_ids": input_ids, "attention_mask": attention_mask})
+
+def move_to_device(encoding: BatchEncoding):
+    """Copy encoded inputs to the device, staging them through pinned memory on CUDA"""
+    input_ids = encoding["input_ids"]
+    attention_mask = encoding["attention_mask"]
+    
+    batch_size, length = input_ids.shape
+    if h2d_stream is None or batch_size * length > pinned_input_ids.numel():
+        # Move every tensor of the encoding in one call
+        encoding = encoding.to(device)
+        return encoding["input_ids"], encoding["attention_mask"]
+    
+    with staging_lock:
+        # The previous copy out of the pinned buffers must finish before they are overwritten
+        h2d_stream.synchronize()
+        staged_ids = pinned_input_ids[:batch_size * length].view(batch_size, length)
+        staged_mask = pinned_attention_mask[:batch_size * length].view(batch_size, length)
+        staged_ids.copy_(input_ids)
+        staged_mask.copy_(attention_mask)
         
-        # Tokenize input exactly as shown in the model documentation
-        encoding = tokenizer(input_text, padding='longest', return_tensors="pt")
+        with torch.cuda.stream(h2d_stream):
+            input_ids = staged_ids.to(device, non_blocking=True)
+            attention_mask = staged_mask.to(device, non_blocking=True)
+    
+    # The compute stream waits for the copies before using the tensors
+    compute_stream = torch.cuda.current_stream()
+    compute_stream.wait_stream(h2d_stream)
+    input_ids.record_stream(compute_stream)
+    attention_mask.record_stream(compute_stream)
+    return input_ids, attention_mask
+
+def inference_context():
+    """Autocast context matching the model dtype (no-op on CPU and for ONNX Runtime)"""
+    if backend == "pytorch" and device.type == "cuda":
+        return torch.autocast(device_type="cuda", dtype=model_dtype)
+    return nullcontext()
+
+def sample_next_token(logits: torch.Tensor, top_k: int, top_p: float) -> torch.Tensor:
+    """Top-k then nucleus sampling of one token per row"""
+    values, indices = torch.topk(logits, min(top_k, logits.size(-1)), dim=-1)
+    probs = torch.softmax(values.float(), dim=-1)
+    
+    # Drop tokens once the probability mass before them reaches top_p
+    # (the most likely token is always kept)
+    mass_before = probs.cumsum(dim=-1) - probs
+    probs = probs.masked_fill(mass_before >= top_p, 0.0)
+    
+    choice = torch.multinomial(probs, num_samples=1)
+    return indices.gather(-1, choice).squeeze(-1)
+
+def traced_generate(input_ids: torch.Tensor, attention_mask: torch.Tensor, max_new_tokens: int,
+                    top_k: int = 50, top_p: float = 0.95) -> torch.Tensor:
+    """Sampling loop over the traced modules, returning sequences shaped like model.generate"""
+    encoder = app.state.traced_encoder
+    decoder = app.state.traced_decoder
+    decoder_pkv = app.state.traced_decoder_pkv
+    
+    # The encoder runs once, every decode step reuses its output and the cached keys/values
+    encoder_hidden_states = encoder(input_ids, attention_mask)
+    
+    batch_size = encoder_hidden_states.size(0)
+    next_tokens = torch.full(
+        (batch_size,), model.config.decoder_start_token_id, dtype=torch.long, device=device
+    )
+    logits, past_key_values = decoder(next_tokens[:, None], encoder_hidden_states, attention_mask)
+    
+    sequences = [next_tokens]
+    finished = torch.zeros(batch_size, dtype=torch.bool, device=device)
+    while True:
+        next_tokens = sample_next_token(logits[:, -1, :], top_k, top_p)
+        # Sequences that already emitted </s> keep emitting padding
+        next_tokens = next_tokens.masked_fill(finished, model.config.pad_token_id)
+        sequences.append(next_tokens)
+        finished |= next_tokens == model.config.eos_token_id
+        
+        if finished.all() or len(sequences) > max_new_tokens:
+            break
+        
+        logits, past_key_values = decoder_pkv(
+            next_tokens[:, None], encoder_hidden_states, attention_mask, past_key_values
+        )
+    
+    return torch.stack(sequences, dim=1)
+
+def generation_params(num_return_sequences: int, top_k: int, top_p: float) -> dict:
+    """Decoding strategy passed to model.generate"""
+    # A single sequence is sampled (early_stopping only applies to beam search);
+    # several sequences are the top beams of a beam search
+    if num_return_sequences > 1:
+        return {
+            "num_beams": num_return_sequences,
+            "do_sample": False,
+            "early_stopping": True,
+            "num_return_sequences": num_return_sequences
+        }
+    return {"do_sample": True, "top_k": top_k, "top_p": top_p}
+
+def sampling_key(num_return_sequences: int, top_k: int, top_p: float) -> tuple:
+    """The part of top_k/top_p that affects the output: beam search ignores both"""
+    if num_return_sequences > 1:
+        return (None, None)
+    return (top_k, top_p)
+
+def decode_budget(max_length: int, input_length: int) -> int:
+    """Number of tokens to decode: a paraphrase is rarely much longer than its input"""
+    return min(max_length, int(input_length * 1.5) + 16)
+
+def encoder_kwargs(input_ids: torch.Tensor, attention_mask: torch.Tensor) -> dict:
+    """Precomputed encoder outputs for model.generate when a traced encoder is available"""
+    encoder = getattr(app.state, "traced_encoder", None)
+    if encoder is None:
+        return {}
+    # Run the traced encoder here so generate only drives the decoder
+    return {"encoder_outputs": BaseModelOutput(last_hidden_state=encoder(input_ids, attention_mask))}
+
+def run_generate(texts: List[str], max_length: int = 512, num_return_sequences: int = 1,
+                 top_k: int = 50, top_p: float = 0.95) -> List[Union[str, List[str]]]:
+    """Generate paraphrases for several texts with a single padded generate call (a list per text when num_return_sequences > 1)"""
+    try:
+        # Tokenize all inputs at once, padded to the longest one
+        encoding = encode_inputs(texts)
         
         # Move to device
-        input_ids = encoding["input_ids"].to(device)
-        attention_mask = encoding["attention_mask"].to(device)
+        input_ids, attention_mask = move_to_device(encoding)
         
-        # Generate paraphrase exactly as shown in the model documentation
-        with torch.no_grad():
-            outputs = model.generate(
-                input_ids=input_ids, 
-                attention_mask=attention_mask,
-                max_length=max_length,
-                do_sample=True,
-                top_k=200,
-                top_p=0.95,
-                early_stopping=True,
-                num_return_sequences=num_return_sequences
-            )
+        # Stop decoding well before max_length for short inputs
+        max_new_tokens = decode_budget(max_length, input_ids.shape[1])
+        
+        # Generate paraphrases for the whole batch
+        with torch.no_grad(), inference_context():
+            # The traced loop only implements sampling
+            if getattr(app.state, "traced_decoder", None) is not None and num_return_sequences == 1:
+                outputs = traced_generate(
+                    input_ids,
+                    attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    top_k=top_k,
+                    top_p=top_p
+                )
+            else:
+                outputs = model.generate(
+                    input_ids=input_ids, 
+                    attention_mask=attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    **generation_params(num_return_sequences, top_k, top_p),
+                    **encoder_kwargs(input_ids, attention_mask)
+                )
         
-        # Decode output - take the first sequence if multiple
-        paraphrase = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        paraphrases = [
+            paraphrase.strip()
+            for paraphrase in tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        ]
+        if num_return_sequences == 1:
+            return paraphrases
         
-        return paraphrase.strip()
+        # generate returns num_return_sequences consecutive rows per input
+        return [
+            paraphrases[start:start + num_return_sequences]
+            for start in range(0, len(paraphrases), num_return_sequences)
+        ]
         
     except Exception as e:
         logger.error(f"Error generating paraphrase: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Paraphrase generation failed: {str(e)}")
 
+class StopOnEvent(StoppingCriteria):
+    """Stops generate once the event is set, e.g. when a streaming client disconnects"""
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+def stream_generate(request: ParaphraseRequest, streamer: TextIteratorStreamer, stop_event: threading.Event):
+    """Generate a single sampled paraphrase, pushing decoded text into the streamer"""
+    try:
+        encoding = encode_inputs([request.text])
+        input_ids, attention_mask = move_to_device(encoding)
+        
+        # Streaming only supports one sampled sequence (no beam search)
+        with torch.no_grad(), inference_context():
+            model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=decode_budget(request.max_length, input_ids.shape[1]),
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([StopOnEvent(stop_event)]),
+                **generation_params(1, request.top_k, request.top_p),
+                **encoder_kwargs(input_ids, attention_mask)
+            )
+    except Exception:
+        # Unblock the consumer before propagating the error
+        streamer.end()
+        raise
+
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Event, with one data: line per line of text"""
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+def generate_paraphrase_batch(texts: List[str], max_length: int = 512, num_return_sequences: int = 1,
+                              top_k: int = 50, top_p: float = 0.95) -> List[Union[str, List[str]]]:
+    """Generate paraphrases for texts that missed the LRU cache and store them in it"""
+    # style is not part of the key since the model ignores it
+    sampling = sampling_key(num_return_sequences, top_k, top_p)
+    keys = [(text, max_length, num_return_sequences, *sampling) for text in texts]
+    
+    # Seed from a process-stable digest of the keys so the same batch of misses
+    # decodes the same way in every worker and after restarts. A text's sample
+    # still depends on which other texts share its generate call. fork_rng
+    # restores the global RNG afterwards so other sampling (e.g.
+    # /paraphrase-stream) does not depend on the last batch's keys
+    seed = zlib.crc32(repr(tuple(keys)).encode("utf-8"))
+    with torch.random.fork_rng(devices=[device] if device.type == "cuda" else []):
+        torch.manual_seed(seed)
+        results = run_generate(texts, max_length, num_return_sequences, top_k, top_p)
+    
+    if CACHE_SIZE > 0:
+        with cache_lock:
+            for key, result in zip(keys, results):
+                paraphrase_cache[key] = result
+    
+    return results
+
+def cached_paraphrase(request: ParaphraseRequest) -> Optional[Union[str, List[str]]]:
+    """Look up a request in the LRU cache, counting the hit or miss"""
+    key = (request.text, *generation_key(request))
+    with cache_lock:
+        result = paraphrase_cache.get(key)
+        cache_stats["hits" if result is not None else "misses"] += 1
+    return result
+
+def generation_key(request: ParaphraseRequest) -> tuple:
+    """Requests with the same key can share one generate call"""
+    return (
+        request.max_length,
+        request.num_return_sequences,
+        *sampling_key(request.num_return_sequences, request.top_k, request.top_p)
+    )
+
+def group_requests(requests: List[ParaphraseRequest]) -> List[List[int]]:
+    """Indices of requests that can share one generate call, at most MAX_BATCH per group"""
+    groups = {}
+    for index, request in enumerate(requests):
+        groups.setdefault(generation_key(request), []).append(index)
+    
+    return [
+        indices[start:start + MAX_BATCH]
+        for indices in groups.values()
+        for start in range(0, len(indices), MAX_BATCH)
+    ]
+
+def paraphrase_group(group: List[ParaphraseRequest]) -> List[Union[str, List[str]]]:
+    """Paraphrase requests sharing a generation key with one padded generate call"""
+    first = group[0]
+    return generate_paraphrase_batch(
+        [request.text for request in group],
+        max_length=first.max_length,
+        num_return_sequences=first.num_return_sequences,
+        top_k=first.top_k,
+        top_p=first.top_p
+    )
+
+def build_response(request: ParaphraseRequest, result: Union[str, List[str]], processing_time: float) -> ParaphraseResponse:
+    """Build a paraphrase response around the shared model details"""
+    # Every field comes from already-validated values, so skip re-validation
+    return ParaphraseResponse.model_construct(
+        result=result,
+        original_text=request.text,
+        style=request.style,
+        processing_time=processing_time,
+        model_details={
+            **base_model_details,
+            "max_length": request.max_length,
+            "num_return_sequences": request.num_return_sequences
+        }
+    )
+
+async def run_inference(func, *args):
+    """Run a blocking inference call in a thread, one call at a time"""
+    async with inference_semaphore:
+        return await asyncio.to_thread(func, *args)
+
+async def submit(request: ParaphraseRequest) -> Union[str, List[str]]:
+    """Queue a request for the batch worker and wait for its paraphrase"""
+    future = asyncio.get_running_loop().create_future()
+    await request_queue.put((request, future))
+    return await future
+
+async def batch_worker():
+    """Coalesce queued requests into batches and run one generate call per group of matching requests"""
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        # Block for the first request, then collect more until the batch is
+        # full or MAX_WAIT_MS has passed
+        batch = [await request_queue.get()]
+        deadline = loop.time() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(request_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        requests = [request for request, _ in batch]
+        for indices in group_requests(requests):
+            items = [batch[index] for index in indices]
+            try:
+                # The event loop keeps queueing requests while this group decodes
+                results = await run_inference(paraphrase_group, [request for request, _ in items])
+            except Exception as e:
+                # A failing group only fails its own requests
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
 @app.get("/", response_model=dict)
 async def root():
     """Root endpoint"""
@@ -169,6 +785,7 @@ async def root():
         "endpoints": {
             "health": "/health",
             "paraphrase": "/paraphrase",
+            "paraphrase_stream": "/paraphrase-stream",
             "batch_paraphrase": "/batch-paraphrase"
         }
     }
@@ -179,8 +796,15 @@ async def health_check():
     return HealthResponse(
         status="healthy" if model is not None else "unhealthy",
         is_model_loaded=model is not None,
+        model=model_name if model is not None else None,
+        backend=backend,
         device=str(device) if device else "unknown",
-        uptime=time.time() - getattr(app, 'startup_time', time.time())
+        uptime=time.time() - getattr(app, 'startup_time', time.time()),
+        cache={
+            "size": len(paraphrase_cache),
+            "max_size": CACHE_SIZE,
+            **cache_stats
+        }
     )
 
 @app.post("/paraphrase", response_model=ParaphraseResponse)
@@ -193,33 +817,65 @@ async def paraphrase_text(request: ParaphraseRequest):
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        # Generate paraphrase
-        result = generate_paraphrase(
-            text=request.text,
-            style=request.style,
-            max_length=request.max_length,
-            num_return_sequences=request.num_return_sequences
-        )
+        # Cache hits are answered right away; misses go through the
+        # micro-batching queue
+        result = cached_paraphrase(request)
+        if result is None:
+            result = await submit(request)
         
         processing_time = time.time() - start_time
         
-        return ParaphraseResponse(
-            result=result,
-            original_text=request.text,
-            style=request.style,
-            processing_time=processing_time,
-            model_details={
-                "model": "Wikidepia/IndoT5-base-paraphrase",
-                "device": str(device),
-                "max_length": request.max_length,
-                "num_return_sequences": request.num_return_sequences
-            }
-        )
+        return build_response(request, result, processing_time)
         
     except Exception as e:
         logger.error(f"Paraphrase error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/paraphrase-stream")
+async def paraphrase_stream(request: ParaphraseRequest):
+    """Paraphrase a single text, streaming the output as Server-Sent Events"""
+    # Check if model is loaded
+    if model is None or tokenizer is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    async def event_stream():
+        # skip_prompt drops the decoder start token
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop_event = threading.Event()
+        error = None
+        
+        async with inference_semaphore:
+            generation = asyncio.create_task(
+                asyncio.to_thread(stream_generate, request, streamer, stop_event)
+            )
+            try:
+                while True:
+                    text = await asyncio.to_thread(next, streamer, None)
+                    if text is None:
+                        break
+                    if text:
+                        yield sse_event(text)
+            finally:
+                # If the client disconnected, stop decoding and keep holding the
+                # semaphore until the generate thread has actually returned.
+                # Starlette cancels the response task group on disconnect and
+                # anyio re-delivers the cancellation, so shield the whole wait
+                stop_event.set()
+                with anyio.CancelScope(shield=True):
+                    try:
+                        await generation
+                    except Exception as e:
+                        error = e
+        
+        if error is not None:
+            logger.error(f"Stream paraphrase error: {str(error)}")
+            yield sse_event("Paraphrase generation failed", event="error")
+            return
+        
+        yield sse_event("[DONE]", event="end")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/batch-paraphrase")
 async def batch_paraphrase_texts(requests: List[ParaphraseRequest]):
     """Paraphrase multiple texts"""
@@ -228,31 +884,24 @@ async def batch_paraphrase_texts(requests: List[ParaphraseRequest]):
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        results = []
-        for request in requests:
-            start_time = time.time()
-            
-            result = generate_paraphrase(
-                text=request.text,
-                style=request.style,
-                max_length=request.max_length,
-                num_return_sequences=request.num_return_sequences
-            )
-            
-            processing_time = time.time() - start_time
-            
-            results.append(ParaphraseResponse(
-                result=result,
-                original_text=request.text,
-                style=request.style,
-                processing_time=processing_time,
-                model_details={
-                    "model": "Wikidepia/IndoT5-base-paraphrase",
-                    "device": str(device),
-                    "max_length": request.max_length,
-                    "num_return_sequences": request.num_return_sequences
-                }
-            ))
+        start_time = time.time()
+        
+        # Serve cache hits directly, then decode the misses in padded generate
+        # calls of up to MAX_BATCH texts each
+        paraphrases = [cached_paraphrase(request) for request in requests]
+        misses = [index for index, paraphrase in enumerate(paraphrases) if paraphrase is None]
+        for group in group_requests([requests[index] for index in misses]):
+            indices = [misses[position] for position in group]
+            results = await run_inference(paraphrase_group, [requests[index] for index in indices])
+            for index, result in zip(indices, results):
+                paraphrases[index] = result
+        
+        processing_time = time.time() - start_time
+        
+        results = [
+            build_response(request, result, processing_time)
+            for request, result in zip(requests, paraphrases)
+        ]
         
         return {"results": results, "total": len(results)}
         
@@ -285,18 +934,16 @@ async def global_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
-    # Set startup time
-    app.startup_time = time.time()
-    
     # Run the application
     port = int(os.getenv("PORT", 5005))
     host = os.getenv("HOST", "0.0.0.0")
     
-    logger.info(f"Starting server on {host}:{port}")
+    logger.info(f"Starting server on {host}:{port} with {WORKERS} worker(s)")
     uvicorn.run(
         "app:app",
         host=host,
         port=port,
+        workers=WORKERS,
         reload=False,
         log_level="info"
     )
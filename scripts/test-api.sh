@@ -112,7 +112,20 @@ run_tests() {
     # Test 7: Batch paraphrase
     test_endpoint "/batch-paraphrase" "POST" '[{"text": "Saya ingin membeli produk ini", "style": "friendly"}, {"text": "Terima kasih atas bantuannya", "style": "formal"}]' "Batch Paraphrase"
     
-    # Test 8: Error handling - invalid JSON
+    # Test 8: Streaming paraphrase
+    log_info "Testing Streaming Paraphrase..."
+    response=$(curl -s -N --max-time $TIMEOUT -X POST -H 'Content-Type: application/json' -d '{"text": "Saya ingin membeli produk ini"}' "$BASE_URL/paraphrase-stream" || true)
+    if echo "$response" | grep -q "^event: end"; then
+        log_success "Streaming Paraphrase"
+        echo "$response"
+    else
+        log_error "Streaming Paraphrase - stream did not finish with an end event"
+        echo "$response"
+        return 1
+    fi
+    echo ""
+    
+    # Test 9: Error handling - invalid JSON
     log_info "Testing error handling - invalid JSON..."
     response=$(curl -s -w '\nHTTP Status: %{http_code}\n' -X POST -H 'Content-Type: application/json' -d '{"invalid": "json"' "$BASE_URL/paraphrase" 2>/dev/null || true)
     status_code=$(echo "$response" | grep "HTTP Status:" | cut -d' ' -f3)
@@ -123,7 +136,7 @@ run_tests() {
     fi
     echo ""
     
-    # Test 9: Error handling - empty text
+    # Test 10: Error handling - empty text
     test_endpoint "/paraphrase" "POST" '{"text": "", "style": "friendly"}' "Error Handling (Empty Text)"
     
     log_success "All tests completed!"